@@ -0,0 +1,29 @@
+# Copyright (c) 2025, Arka Mondal. All rights reserved.
+# Use of this source code is governed by a BSD-style license that
+# can be found in the LICENSE file.
+
+# cython: language_level=3
+
+"""Compiled drop-in for engine._lookup.
+
+Build it in place with `cythonize -i _resolver.pyx`; engine.py picks it up
+automatically and falls back to the pure-Python walk when it is not built.
+"""
+
+MISSING = object()
+
+
+cpdef object lookup(tuple keys, object value):
+    """Walk parsed keys through nested dicts and lists, returning MISSING on failure."""
+    cdef object key, index
+    try:
+        for key, index in keys:
+            if index is not None and isinstance(value, list):
+                value = value[index]
+            elif isinstance(value, dict):
+                value = value[key]
+            else:
+                return MISSING
+    except (KeyError, IndexError, TypeError):
+        return MISSING
+    return value
@@ -3,242 +3,481 @@
 # can be found in the LICENSE file.
 
 import re
+import sys
+from functools import lru_cache
+from operator import eq, ge, gt, le, lt, ne
 from pathlib import Path
 
+# Splits a template into {{ variable }} and {% tag %} tokens in one scan.
+# A "{{%" is a literal brace followed by a tag, not a variable.
+_TOKEN_RE = re.compile(r'(?P<var>\{\{(?!%)\s*(?P<name>.*?)\s*\}\})|(?P<tag>\{%(?s:.*?)%\})')
+# Recognizes the numbered block tags among the {% tag %} tokens
+_TAG_RE = re.compile(r'''
+    \{%(?P<id>\d+)
+    (?:
+        \s+if\s+(?P<if_cond>.*?)
+      | \s*elseif\s+(?P<elseif_cond>[^\n]*?)
+      | \s*(?P<else>else)
+      | \s+(?P<endif>endif)
+      | \s+for\s+(?P<item_var>\w+)\s+in\s+(?P<list_var>[\w|\.]+)
+      | \s+(?P<endfor>endfor)
+    )
+    \s*%\}
+''', re.DOTALL | re.VERBOSE)
+_INCLUDE_RE = re.compile(r'\{%\s*include\s*"(.*?)"\s*%\}')
+_STRING_LITERAL_RE = re.compile(r'"\w*"')
+_IDENTIFIER_RE = re.compile(r'[A-Za-z_][A-Za-z0-9_]*')
+# Comparison operators, two-character ones first so they take precedence
+# over > and < at the same position
+_OPS = ('==', '!=', '>=', '<=', '>', '<')
+# Splits a condition on its leftmost operator
+_COND_RE = re.compile(r'^(.*?)(' + '|'.join(map(re.escape, _OPS)) + r')(.*)$', re.DOTALL)
+
+
+_MISSING = object()
+
+_NUMERIC_OPS = {'==': eq, '!=': ne, '>=': ge, '<=': le, '>': gt, '<': lt}
+_STRING_OPS = {'==': eq, '!=': ne}
+
+
+@lru_cache(maxsize=2048)
+def _parse_var(var_name, strip_keys=True):
+    """Parse "education.2.institute | default:'N/A'" into (keys, default, is_literal).
+
+    keys holds a (key, index) pair per path part, where index is the list
+    index for numeric parts and None otherwise. The {{ variable }} pass
+    keeps whitespace around the parts, so "user . name" does not resolve
+    there, while conditions and loop lists strip it.
+    """
+    parts = var_name.split('|')
+    keys = []
+    for key in parts[0].strip().split('.'):
+        # Interned so dict lookups usually succeed on the identity check
+        key = sys.intern(key.strip() if strip_keys else key)
+        keys.append((key, int(key) if key.isdecimal() else None))
+    default = None
+
+    if len(parts) > 1 and 'default:' in parts[1]:
+        default = parts[1].split('default:')[1].strip().strip('"').strip("'")
+
+    is_literal = bool(var_name.isalnum() or _STRING_LITERAL_RE.fullmatch(var_name))
+    return tuple(keys), default, is_literal
+
+
+def _lookup(keys, value):
+    """Walk parsed keys through nested dicts and lists, returning _MISSING on failure."""
+    try:
+        for key, index in keys:
+            if index is not None and isinstance(value, list):
+                value = value[index]
+            elif isinstance(value, dict):
+                value = value[key]
+            else:
+                return _MISSING
+    except (KeyError, IndexError, TypeError):
+        return _MISSING
+    return value
+
+
+def _to_float(value):
+    """Return value as a float, or None when it is not numeric."""
+    if isinstance(value, (int, float)):
+        return float(value)
+    if value is None or isinstance(value, (dict, list)):
+        return None
+    try:
+        return float(value)
+    except (ValueError, TypeError):
+        return None
+
+
+try:
+    # Optional compiled resolver, see _resolver.pyx
+    from _resolver import MISSING as _MISSING, lookup as _lookup
+except ImportError:
+    pass
+
+
 class Monolith:
     def __init__(self, template_dir="."):
         self.template_dir = Path(template_dir)
+        self._template_cache = {}
+        self._source_cache = {}
+        self._expanded_cache = {}
 
     def render(self, template_name, context):
-        template_path = self.template_dir / template_name
-        with open(template_path, "r") as f:
-            template = f.read()
-
-        template = self._process_includes(template)
-
-        template = self._process_conditionals(template, context)
-
-        template = self._process_loops(template, context)
-
-        template = self._replace_variables(template, context)
-
-        return template
-
-    def _replace_variables(self, template, context):
-        """Replace {{ variable }} with values from context, supporting dot notation, list indices, and default values."""
-
-        def resolve_value(var_name, context):
-            """Retrieve value from context using dot notation and list indices."""
-            parts = var_name.split('|')  # Split variable and filter ("education.2.institute | default:'N/A'")
-            variable_path = parts[0].strip()
-            default_value = None
-
-            # Extract default value if provided
-            if len(parts) > 1 and "default:" in parts[1]:
-                default_value = parts[1].split("default:")[1].strip().strip('"').strip("'")
-
-            keys = variable_path.split('.')  # ['education', '0', '2', 'institute']
-            value = context
-
+        template_path = (self.template_dir / template_name).resolve()
+        deps, template = self._expand_template(template_path)
+
+        # Templates are parsed once and re-parsed only when the file or
+        # one of its partials changes
+        entry = self._template_cache.get(template_path)
+        if entry is None or entry[0] != deps:
+            segments = self._compile(template)
+            entry = (deps, segments)
+            self._template_cache[template_path] = entry
+
+        parts = []
+        self._render_to(entry[1], context, parts)
+        return ''.join(parts)
+
+    def _read_source(self, path):
+        """Return (mtime_ns, content) for a template file, reading it only when it changed."""
+        mtime = path.stat().st_mtime_ns
+
+        entry = self._source_cache.get(path)
+        if entry is None or entry[0] != mtime:
+            with open(path, "r") as f:
+                entry = (mtime, f.read())
+            self._source_cache[path] = entry
+
+        return entry
+
+    def _expand_template(self, path):
+        """Return (deps, content) for a template with all includes expanded.
+
+        deps is a tuple of (path, mtime_ns) pairs for the template and every
+        partial it pulls in, with None for partials that do not exist.
+        """
+        entry = self._expanded_cache.get(path)
+        if entry is not None and self._is_fresh(entry[0]):
+            return entry
+
+        deps = {}
+        template = self._expand(path, deps, ())
+
+        entry = (tuple(deps.items()), template)
+        self._expanded_cache[path] = entry
+        return entry
+
+    def _expand(self, path, deps, active):
+        mtime, template = self._read_source(path)
+        deps[path] = mtime
+        return self._process_includes(template, deps, active + (path,))
+
+    def _is_fresh(self, deps):
+        for path, mtime in deps:
             try:
-                for key in keys:
-                    if isinstance(value, list) and key.isdigit():
-                        index = int(key)
-                        value = value[index]
-                    elif isinstance(value, dict) and key in value:
-                        value = value[key]
-                    else:
-                        raise KeyError
-            except (KeyError, IndexError, TypeError):
-                return default_value if default_value is not None else ""
-
-            return str(value)
-
-        def replace_match(match):
-            var_name = match.group(1).strip()
-            return resolve_value(var_name, context)
+                current = path.stat().st_mtime_ns
+            except FileNotFoundError:
+                current = None
+            if current != mtime:
+                return False
+        return True
+
+    def _compile(self, template):
+        """Parse a template into a list of segments in a single scan.
+
+        Segments are ("literal", text), ("var", name), ("fmt", format_string,
+        names) for text where every variable is a plain identifier, with one
+        positional field per distinct name,
+        ("if", [(condition, segments), ...]) where conditions come from
+        _compile_condition and an else branch has a condition of None, and
+        ("for", item_var, list_var, segments).
+
+        Blocks are paired by their {%n ... %} number. A block that is never
+        closed is kept as literal text around its contents.
+        """
+        if '{' not in template:
+            return [("literal", template)] if template else []
+
+        root = []
+        # Open blocks, innermost last. Each branch is [condition, segments,
+        # tag], the first one being opened by the block's own tag.
+        stack = []
+        # Pending text: literals alternating with variable names
+        run = [""]
+
+        def target():
+            return stack[-1]["branches"][-1][1] if stack else root
+
+        def flush():
+            target().extend(self._compile_run(run))
+            run[:] = [""]
+
+        def find(kind, block_id):
+            for idx in range(len(stack) - 1, -1, -1):
+                if stack[idx]["kind"] == kind and stack[idx]["id"] == block_id:
+                    return idx
+            return None
+
+        def unwind(idx):
+            # Blocks opened inside stack[idx] that were never closed
+            while len(stack) > idx + 1:
+                frame = stack.pop()
+                segments = target()
+                for _, body, tag in frame["branches"]:
+                    segments.append(("literal", tag))
+                    segments.extend(body)
+
+        pos = 0
+        while True:
+            match = _TOKEN_RE.search(template, pos)
+            if match is None:
+                break
 
-        return re.sub(r'\{\{\s*(.*?)\s*\}\}', replace_match, template)
+            run[-1] += template[pos:match.start()]
+            if match.group('var') is not None:
+                name = match.group('name')
+                if '{%' in name:
+                    # A literal "{" right before a tag, as in CSS or JS:
+                    # keep it as text and rescan from the tag
+                    run[-1] += "{"
+                    pos = match.start() + 1
+                    continue
+
+                run.append(name.strip())
+                run.append("")
+                pos = match.end()
+                continue
+
+            text = match.group('tag')
+            tag = _TAG_RE.fullmatch(text)
+            if tag is not None:
+                block_id = tag.group('id')
+                kind = "for" if tag.group('item_var') or tag.group('endfor') else "if"
+                opening = bool(tag.group('item_var')) or tag.group('if_cond') is not None
+                idx = find(kind, block_id)
+
+                # An opening tag must not reuse the number of a block that is
+                # still open, any other tag needs such a block to attach to
+                if opening == (idx is None):
+                    flush()
+                    pos = match.end()
+
+                    if opening:
+                        frame = {"kind": kind, "id": block_id, "branches": [[None, [], text]]}
+                        if kind == "if":
+                            frame["branches"][0][0] = self._compile_condition(tag.group('if_cond'))
+                        else:
+                            frame["loop"] = (sys.intern(tag.group('item_var')), tag.group('list_var'))
+                        stack.append(frame)
+                        continue
+
+                    unwind(idx)
+                    frame = stack[-1]
+                    if tag.group('else'):
+                        frame["branches"].append([None, [], text])
+                    elif tag.group('elseif_cond') is not None:
+                        cond = self._compile_condition(tag.group('elseif_cond'))
+                        frame["branches"].append([cond, [], text])
+                    else:
+                        stack.pop()
+                        if kind == "if":
+                            segment = ("if", [(cond, body) for cond, body, _ in frame["branches"]])
+                        else:
+                            body = frame["branches"][0][1]
+                            segment = ("for", *frame["loop"], body)
+                        target().append(segment)
+                    continue
+
+            # Not a block tag or nothing to pair it with: keep the "{%" as
+            # text and rescan the rest for tokens
+            run[-1] += "{%"
+            pos = match.start() + 2
+
+        run[-1] += template[pos:]
+        flush()
+        unwind(-1)
+        return root
+
+    def _compile_condition(self, condition):
+        """Parse a condition into one of:
+
+        ("const", bool), ("test", name), ("cmp", left, op, right) when both
+        sides need resolving, and ("cmp_num", left, op, number, text) or
+        ("cmp_str", left, op, text) when the right-hand side is a literal.
+        """
+        if condition.lower() in ['true', 'false']:
+            return ("const", condition.lower() == 'true')
+        if not any(op in condition for op in _OPS):
+            return ("test", condition.strip())
+
+        m = _COND_RE.match(condition)
+
+        left, op, right = m.groups()
+        left, right = left.strip(), right.strip()
+        if not _parse_var(right)[2]:
+            return ("cmp", left, op, right)
+
+        # The right-hand side is a literal, so pick its comparison up front
+        if _parse_var(left)[2]:
+            return ("const", self._compare_values(left, op, right))
+        text = right.strip('"\'').lower()
+        number = _to_float(right)
+        if number is not None:
+            return ("cmp_num", left, op, number, text)
+        if op not in _STRING_OPS:
+            return ("const", False)
+        return ("cmp_str", left, op, text)
+
+    def _compile_run(self, run):
+        """Compile collected text, given as literals alternating with variable names."""
+        literals = run[0::2]
+        names = tuple(run[1::2])
+
+        if not names:
+            return [("literal", literals[0])] if literals[0] else []
+
+        # Runs of plain identifiers render with a single str.format call,
+        # resolving a name used several times in the run only once
+        if all(_IDENTIFIER_RE.fullmatch(name) for name in names):
+            fields = {name: str(idx) for idx, name in enumerate(dict.fromkeys(names))}
+            literals = [literal.replace('{', '{{').replace('}', '}}') for literal in literals]
+            fmt = literals[0] + ''.join(
+                '{' + fields[name] + '}' + literal for name, literal in zip(names, literals[1:])
+            )
+            return [("fmt", fmt, tuple(fields))]
+
+        segments = []
+        for idx, piece in enumerate(run):
+            if idx % 2:
+                segments.append(("var", piece))
+            elif piece:
+                segments.append(("literal", piece))
+        return segments
+
+    def _render_to(self, segments, context, out, root=None, chosen=None):
+        """Render compiled segments against a context, appending the output to out."""
+        # Conditions always see the top-level context, loop bodies only
+        # see their own loop variable. An if therefore picks the same
+        # branch on every loop item, so chosen remembers it per segment
+        # for the rest of the render.
+        if root is None:
+            root = context
+            chosen = {}
+
+        for segment in segments:
+            kind = segment[0]
+            if kind == "literal":
+                out.append(segment[1])
+            elif kind == "var":
+                out.append(self._resolve_text(segment[1], context))
+            elif kind == "fmt":
+                out.append(segment[1].format(*[self._resolve_text(name, context) for name in segment[2]]))
+            elif kind == "if":
+                key = id(segment)
+                body = chosen.get(key, _MISSING)
+                if body is _MISSING:
+                    body = chosen[key] = self._select_branch(segment[1], root)
+                if body is not None:
+                    self._render_to(body, context, out, root, chosen)
+            else:
+                _, item_var, list_var, body = segment
+                items = self._resolve_value(list_var, context)
+
+                if items == None:
+                    items = []
+
+                if not isinstance(items, list):
+                    items = [items]  # Handle single item contexts
+
+                # One frame per loop, only the loop variable changes per item
+                new_context = {}
+                for item in items:
+                    new_context[item_var] = item
+                    self._render_to(body, new_context, out, root, chosen)
+
+    def _select_branch(self, branches, ctx):
+        """Return the segments of the first branch whose condition holds, or None."""
+        for cond, body in branches:
+            if cond is None or self._eval_condition(cond, ctx):
+                return body
+        return None
+
+    def _resolve_text(self, var_name, context):
+        """Retrieve value from context as a string, using dot notation and list indices."""
+        keys, default_value, _ = _parse_var(var_name, False)
+        value = _lookup(keys, context)
+
+        if value is _MISSING:
+            return default_value if default_value is not None else ""
+
+        # Context values are nearly always strings already
+        return value if type(value) is str else str(value)
 
     def _resolve_value(self, var_name, ctx):
         """Universal resolver with default handling and nested access"""
+        keys, default, is_literal = _parse_var(var_name)
 
-        parts = var_name.split('|')
-        var_path = parts[0].strip().split('.')
-        default = None
-
-        if var_name.isalnum() or re.fullmatch(r'"\w*"', var_name):
+        if is_literal:
             return var_name
 
-        if len(parts) > 1 and 'default:' in parts[1]:
-            default = parts[1].split('default:')[1].strip().strip('"').strip("'")
-
-        current = ctx
-        try:
-            for part in var_path:
-                part = part.strip()
-                if isinstance(current, list) and part.isdigit():
-                    current = current[int(part)]
-                elif isinstance(current, dict):
-                    current = current[part]
-                else:
-                    raise KeyError(f"Can't resolve {part} in {var_name}")
-            return current
-        except (KeyError, IndexError, TypeError, ValueError):
-            return default if default is not None else None
+        value = _lookup(keys, ctx)
+        return default if value is _MISSING else value
 
     def _compare_values(self, var_value, operator, comparison_value):
-        try:
-            num_var = float(var_value)
-            num_comp = float(comparison_value)
-            return {
-                '==': num_var == num_comp,
-                '!=': num_var != num_comp,
-                '>=': num_var >= num_comp,
-                '<=': num_var <= num_comp,
-                '>': num_var > num_comp,
-                '<': num_var < num_comp
-            }.get(operator, False)
-        except (ValueError, TypeError):
-            # print(var_value, operator, comparison_value)
-            str_var = str(var_value).lower()
-            str_comp = str(comparison_value).strip('"\'').lower()
-            return {
-                '==': str_var == str_comp,
-                '!=': str_var != str_comp
-            }.get(operator, False)
-
-    def _process_conditionals(self, template, context, depth=1):
-        """Handle {%n if condition %}...{%n endif %} blocks with optional elseif and else."""
-
-        def eval_condition(condition, ctx):
-            """Evaluate complex conditions with comparison operators."""
-            if condition.lower() in ['true', 'false']:
-                return condition.lower() == 'true'
-            operators = ['==', '!=', '>=', '<=', '>', '<']
-            for op in operators:
-                if op in condition:
-                    left, right = condition.split(op, 1)
-                    left_val = self._resolve_value(left.strip(), ctx)
-                    right_val = self._resolve_value(right.strip(), ctx)
-                    return self._compare_values(left_val, op, right_val)
-            return bool(self._resolve_value(condition.strip(), ctx))
-
-        # Pattern to match {%n if ... %} ... {%n endif %} (including nested blocks)
-        pattern = re.compile(
-            r'\{%(\d+)\s+if\s+(.*?)\s*%\}(.*?)\{%\1\s+endif\s*%\}',
-            re.DOTALL
-        )
+        compare = _NUMERIC_OPS.get(operator)
+        if compare is None:
+            return False
+
+        num_var = _to_float(var_value)
+        num_comp = _to_float(comparison_value) if num_var is not None else None
+        if num_comp is not None:
+            return compare(num_var, num_comp)
+
+        # print(var_value, operator, comparison_value)
+        return self._compare_text(var_value, operator, str(comparison_value).strip('"\'').lower())
+
+    def _compare_text(self, var_value, operator, str_comp):
+        compare = _STRING_OPS.get(operator)
+        if compare is None:
+            return False
+        return compare(str(var_value).lower(), str_comp)
+
+    def _eval_condition(self, condition, ctx):
+        """Evaluate a condition compiled by _compile_condition."""
+        kind = condition[0]
+        if kind == "const":
+            return condition[1]
+        if kind == "cmp_str":
+            _, left, op, text = condition
+            return self._compare_text(self._resolve_value(left, ctx), op, text)
+        if kind == "cmp_num":
+            _, left, op, number, text = condition
+            left_val = self._resolve_value(left, ctx)
+            num_var = _to_float(left_val)
+            if num_var is None:
+                return self._compare_text(left_val, op, text)
+            return _NUMERIC_OPS[op](num_var, number)
+        if kind == "cmp":
+            _, left, op, right = condition
+            left_val = self._resolve_value(left, ctx)
+            right_val = self._resolve_value(right, ctx)
+            return self._compare_values(left_val, op, right_val)
+        return bool(self._resolve_value(condition[1], ctx))
+
+    def _process_includes(self, template, deps, active):
+        """Handle {% include "navbar.html" %}, recursively expanding nested includes.
+
+        The partials used are recorded in deps. A partial that is already
+        being expanded further up in active is left in place.
+        """
+        if 'include' not in template:
+            return template
+
+        # Each partial is expanded once per template, and substituting in a
+        # single pass never rescans the text that was inserted
+        expanded = {}
 
-        while True:
-            matches = list(pattern.finditer(template))
-            if not matches:
-                break
-
-            for match in reversed(matches):
-                full_block = match.group(0)
-                block_id = match.group(1)
-                if_condition = match.group(2)
-                full_body = match.group(3)
-
-                # Recursively process any nested conditionals
-                full_body = self._process_conditionals(full_body, context, depth + 1)
-
-                # Split the full_body into parts.
-                # The first part (before any elseif/else tokens) belongs to the original if.
-                # The pattern splits on tokens like {%<id> elseif ... %} or {%<id> else %}.
-                token_pattern = re.compile(
-                    rf'(\{{%{block_id}\s*(?:elseif\s+.*?|else)\s*%\}})'
-                )
-                tokens = token_pattern.split(full_body)
-
-                # tokens[0] is always the body of the "if"
-                parts = []
-                parts.append(("if", if_condition, tokens[0]))
-
-                # process any following elseif/else tokens
-                idx = 1
-                while idx < len(tokens):
-                    token = tokens[idx]
-                    # token may be an elseif or else
-                    if 'elseif' in token:
-                        m = re.search(r'elseif\s+(.*?)\s*%', token)
-                        cond = m.group(1) if m else ""
-                        body = tokens[idx+1] if idx+1 < len(tokens) else ""
-                        parts.append(("elseif", cond, body))
-                    elif 'else' in token:
-                        body = tokens[idx+1] if idx+1 < len(tokens) else ""
-                        parts.append(("else", None, body))
-                    idx += 2
-
-                replacement = ''
-                for block_type, cond, body in parts:
-                    # print(block_type)
-                    if block_type == "else" or eval_condition(cond, context):
-                        replacement = body
-                        break
-
-                template = template.replace(full_block, replacement, 1)
-
-        return template
-
-    def _process_loops(self, template, context, depth=1):
-        pattern = re.compile(
-            r'\{%(\d+)\s+for\s+(\w+)\s+in\s+([\w|\.]+)\s*%\}(.*?)\{%\1\s+endfor\s*%\}',
-            re.DOTALL
-        )
-
-        # Process all loops in the template
-        while True:
-            match = pattern.search(template)
-            if not match:
-                break
-
-            k, item_var, list_var, block = match.groups()
-
-            items = self._resolve_value(list_var, context)
-
-            if items == None:
-                items = []
-
-            if not isinstance(items, list):
-                items = [items]  # Handle single item contexts
-
-            loop_content = []
-            for item in items:
-                # new_context = dict(context)
-                new_context = dict()
-                new_context[item_var] = item
-
-                processed_block = self._process_loops(block, new_context, depth + 1)
-
-                loop_content.append(
-                    self._replace_variables(processed_block, new_context)
-                )
-
-            sub_pattern = re.compile(
-                r'\{%' + re.escape(k) + r'\s+for\s+' + re.escape(item_var) +
-                r'\s+in\s+' + re.escape(list_var) + r'\s*%\}(.*?)\{%' +
-                re.escape(k) + r'\s+endfor\s*%\}',
-                re.DOTALL
-            )
-
-            template = sub_pattern.sub(''.join(loop_content), template, count=1)
-
-        return template
-
-
-    def _process_includes(self, template):
-        """Handle {% include "navbar.html" %}"""
-        pattern = r'\{%\s*include\s*"(.*?)"\s*%\}'
-        matches = re.findall(pattern, template)
-
-        for partial_name in matches:
-            partial_path = self.template_dir / partial_name
-            if partial_path.exists():
-                with open(partial_path, "r") as f:
-                    partial_content = f.read()
+        def replace_match(match):
+            partial_name = match.group(1)
+            # Only the canonical spelling of the tag is replaced
+            if match.group(0) != f'{{% include "{partial_name}" %}}':
+                return match.group(0)
+
+            if partial_name not in expanded:
+                partial_path = (self.template_dir / partial_name).resolve()
+                if partial_path in active:
+                    expanded[partial_name] = None
+                else:
+                    try:
+                        expanded[partial_name] = self._expand(partial_path, deps, active)
+                    except FileNotFoundError:
+                        deps[partial_path] = None
+                        expanded[partial_name] = None
 
-                template = template.replace(f'{{% include "{partial_name}" %}}', partial_content)
+            partial_content = expanded[partial_name]
+            return match.group(0) if partial_content is None else partial_content
 
-        return template
+        return _INCLUDE_RE.sub(replace_match, template)
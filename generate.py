@@ -7,10 +7,16 @@ import sys
 from pathlib import Path
 from engine import Monolith
 
+try:
+    # libyaml-backed loader, much faster on large content files
+    from yaml import CSafeLoader as _Loader
+except ImportError:
+    from yaml import SafeLoader as _Loader
+
 def parse_yaml(filepath):
     try:
         with open(filepath, "r", encoding="utf-8") as f:
-            content = yaml.safe_load(f)
+            content = yaml.load(f, Loader=_Loader)
 
         return content
     except FileNotFoundError:
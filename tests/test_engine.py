@@ -0,0 +1,142 @@
+# Copyright (c) 2025, Arka Mondal. All rights reserved.
+# Use of this source code is governed by a BSD-style license that
+# can be found in the LICENSE file.
+
+import os
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from engine import Monolith
+
+
+class EngineTestCase(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.template_dir = Path(self._tmp.name)
+        self.engine = Monolith(self.template_dir)
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def write(self, name, content):
+        path = self.template_dir / name
+        existed = path.exists()
+        path.write_text(content)
+        if existed:
+            # Make sure a rewrite is visible even on coarse mtime clocks
+            mtime = path.stat().st_mtime_ns + 1_000_000_000
+            os.utime(path, ns=(mtime, mtime))
+
+    def render(self, content, context=None, name="page.html"):
+        self.write(name, content)
+        return self.engine.render(name, context or {})
+
+
+class TokenizerTests(EngineTestCase):
+    def test_brace_before_if_tag(self):
+        out = self.render("body {{%1 if flag.on %}color:red;{%1 endif %}}", {"flag": {"on": True}})
+        self.assertEqual(out, "body {color:red;}")
+
+    def test_brace_before_for_tag(self):
+        out = self.render("x{{%1 for c in l.cs %}{{ c }},{%1 endfor %}}", {"l": {"cs": [1, 2]}})
+        self.assertEqual(out, "x{1,2,}")
+
+    def test_brace_around_block_inside_variable_braces(self):
+        out = self.render("{{ {%1 if flag.on %}y{%1 endif %} }}", {"flag": {"on": True}})
+        self.assertEqual(out, "{{ y }}")
+
+    def test_literal_braces_next_to_variables(self):
+        out = self.render("{ {{ title }} } {x}", {"title": "T"})
+        self.assertEqual(out, "{ T } {x}")
+
+
+class VariableTests(EngineTestCase):
+    def test_repeated_identifiers_in_one_run(self):
+        out = self.render("{{ a }}-{{ b }}-{{ a }} {{ missing }}.", {"a": 1, "b": "x"})
+        self.assertEqual(out, "1-x-1 .")
+
+    def test_spaced_path_only_resolves_in_conditions(self):
+        context = {"user": {"name": "bob"}}
+        self.assertEqual(self.render("[{{ user . name }}]{%1 if user . name == bob %}yes{%1 endif %}", context), "[]yes")
+
+    def test_list_indices(self):
+        context = {"items": ["a", "b"], "sup": {"\u00b2": "two"}}
+        self.assertEqual(self.render("{{ items.1 }}{{ items.\u0661 }}{{ items.9 }}{{ sup.\u00b2 }}", context), "bbtwo")
+
+    def test_loop_variables(self):
+        context = {"site": {"posts": [{"t": "A"}, {"t": "B"}]}, "title": "T"}
+        out = self.render("{%1 for p in site.posts %}[{{ p.t }}|{{ p }}|{{ title }}]{%1 endfor %}", context)
+        self.assertEqual(out, "[A|{'t': 'A'}|][B|{'t': 'B'}|]")
+
+
+class ConditionTests(EngineTestCase):
+    def test_branches(self):
+        template = ('{%1 if site.count > 3 %}gt{%1 elseif site.count == 3 %}eq{%1 else %}lt{%1 endif %}'
+                    '{%1 if site.role == "admin" %}A{%1 endif %}{%1 if site.none %}N{%1 endif %}')
+        self.assertEqual(self.render(template, {"site": {"count": 3, "role": "Admin"}}), "eqA")
+        self.assertEqual(self.render(template, {"site": {"count": 5, "role": "user"}}), "gt")
+
+    def test_if_inside_loop_is_evaluated_once_per_render(self):
+        calls = []
+        eval_condition = self.engine._eval_condition
+        self.engine._eval_condition = lambda cond, ctx: calls.append(cond) or eval_condition(cond, ctx)
+
+        template = '{%1 for p in site.posts %}{%2 if site.flag == "yes" %}Y{%2 else %}N{%2 endif %}{%1 endfor %}'
+        context = {"site": {"flag": "yes", "posts": [1, 2, 3]}}
+        self.assertEqual(self.render(template, context), "YYY")
+        self.assertEqual(len(calls), 1)
+
+        context["site"]["flag"] = "no"
+        self.assertEqual(self.render(template, context), "NNN")
+        self.assertEqual(len(calls), 2)
+
+
+class IncludeTests(EngineTestCase):
+    def test_nested_include(self):
+        self.write("inner.html", "I{{ title }}")
+        self.write("outer.html", 'O{% include "inner.html" %}')
+        self.assertEqual(self.render('[{% include "outer.html" %}]', {"title": "T"}), "[OIT]")
+
+    def test_missing_and_non_canonical_includes_are_kept(self):
+        self.write("nav.html", "N")
+        out = self.render('{% include "missing.html" %}{%include "nav.html"%}{% include "nav.html" %}')
+        self.assertEqual(out, '{% include "missing.html" %}{%include "nav.html"%}N')
+
+    def test_include_cycle_is_cut_once_per_copy(self):
+        self.write("a.html", 'A{% include "b.html" %}')
+        self.write("b.html", 'B{% include "a.html" %}')
+        cut = 'AB{% include "a.html" %}'
+        self.assertEqual(self.render('{% include "a.html" %}'), cut)
+        self.assertEqual(self.render('{% include "a.html" %}' * 3), cut * 3)
+
+    def test_cycle_through_repeated_includes_terminates(self):
+        self.write("a.html", '{% include "b.html" %}{% include "b.html" %}')
+        self.write("b.html", '{% include "a.html" %}{% include "a.html" %}')
+        out = self.render('{% include "a.html" %}' * 16)
+        self.assertEqual(out, '{% include "a.html" %}' * 4 * 16)
+
+
+class CacheTests(EngineTestCase):
+    def test_edited_template_is_recompiled(self):
+        self.assertEqual(self.render("old {{ title }}", {"title": "T"}), "old T")
+        self.assertEqual(self.render("new {{ title }}", {"title": "T"}), "new T")
+
+    def test_edited_partial_is_picked_up(self):
+        self.write("p.html", "old")
+        self.write("q.html", '[{% include "p.html" %}]')
+        template = '{{ title }}{% include "q.html" %}{% include "r.html" %}'
+        self.assertEqual(self.render(template, {"title": "T"}), 'T[old]{% include "r.html" %}')
+
+        self.write("p.html", "new")
+        self.assertEqual(self.engine.render("page.html", {"title": "T"}), 'T[new]{% include "r.html" %}')
+
+        self.write("r.html", "R")
+        self.assertEqual(self.engine.render("page.html", {"title": "T"}), "T[new]R")
+
+
+if __name__ == "__main__":
+    unittest.main()